@@ -0,0 +1,285 @@
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils import get_operations_arrays  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _expense_columns(operations):
+    """Вернуть колонки операций, оставив только расходы."""
+    columns = get_operations_arrays(operations)
+    mask = columns["payments"] < 0
+    return {name: values[mask] for name, values in columns.items()}
+
+
+def _group_percentiles(sorted_values, starts, counts, q):
+    """Процентиль q (0..100) для каждой группы отсортированного массива."""
+    position = starts + (counts - 1) * (q / 100)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    fraction = position - lower
+    return sorted_values[lower] * (1 - fraction) + sorted_values[upper] * fraction
+
+
+def _z_from_moments(values, mean, std):
+    """z-оценка values относительно истории со средним mean и разбросом std.
+
+    Если история постоянна (std в пределах ошибки округления), любое
+    отклонение от среднего дает бесконечную оценку со знаком отклонения.
+    """
+    diff = values - mean
+    flat = std <= 1e-6 * np.maximum(np.abs(mean), 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scaled = diff / std
+    unchanged = np.isclose(values, mean)
+    return np.where(
+        flat, np.where(unchanged, 0.0, np.copysign(np.inf, diff)), scaled
+    )
+
+
+def card_statistics(operations, percentiles=(25, 75, 90)):
+    """Посчитать статистику расходов по каждой карте одним группированным проходом.
+
+    Возвращает структурированный массив NumPy с полями card, total_spent,
+    cashback, cashback_rate, count, median и p<N> для каждого процентиля.
+    """
+    columns = _expense_columns(operations)
+    cards, codes = np.unique(columns["cards"], return_inverse=True)
+    amounts = columns["amounts"]
+
+    counts = np.bincount(codes, minlength=len(cards))
+    totals = np.bincount(codes, weights=amounts, minlength=len(cards))
+    cashback = np.bincount(codes, weights=columns["cashback"], minlength=len(cards))
+
+    order = np.lexsort((amounts, codes))
+    sorted_amounts = amounts[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    fields = [
+        ("card", cards.dtype),
+        ("total_spent", "f8"),
+        ("cashback", "f8"),
+        ("cashback_rate", "f8"),
+        ("count", "i8"),
+        ("median", "f8"),
+    ] + [(f"p{q}", "f8") for q in percentiles]
+    result = np.zeros(len(cards), dtype=fields)
+    result["card"] = cards
+    result["total_spent"] = totals
+    result["cashback"] = cashback
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["cashback_rate"] = np.where(totals > 0, cashback / totals, 0.0)
+    result["count"] = counts
+    if len(cards):
+        result["median"] = _group_percentiles(sorted_amounts, starts, counts, 50)
+        for q in percentiles:
+            result[f"p{q}"] = _group_percentiles(sorted_amounts, starts, counts, q)
+    logger.info("Посчитана статистика по картам: " + str(len(cards)))
+    return result
+
+
+def monthly_card_deltas(operations):
+    """Посчитать расходы каждой карты по месяцам и изменение к прошлому месяцу.
+
+    Возвращает структурированный массив с полями card, month, total_spent и
+    delta. Если в предыдущем месяце трат не было, они считаются нулевыми;
+    для первого месяца карты delta равна NaN.
+    """
+    columns = _expense_columns(operations)
+    valid = ~np.isnat(columns["dates"])
+    cards, codes = np.unique(columns["cards"][valid], return_inverse=True)
+    months = columns["dates"][valid].astype("datetime64[M]").astype(np.int64)
+    amounts = columns["amounts"][valid]
+
+    fields = [
+        ("card", cards.dtype),
+        ("month", "datetime64[M]"),
+        ("total_spent", "f8"),
+        ("delta", "f8"),
+    ]
+    if not len(months):
+        return np.zeros(0, dtype=fields)
+
+    first_month = months.min()
+    span = months.max() - first_month + 1
+    keys = codes * span + (months - first_month)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=amounts)
+
+    previous = np.searchsorted(unique_keys, unique_keys - 1)
+    previous = np.minimum(previous, len(unique_keys) - 1)
+    has_previous = unique_keys[previous] == unique_keys - 1
+    card_codes = unique_keys // span
+    first_of_card = np.concatenate(([True], card_codes[1:] != card_codes[:-1]))
+    delta = totals - np.where(has_previous, totals[previous], 0.0)
+    delta[first_of_card] = np.nan
+
+    result = np.zeros(len(unique_keys), dtype=fields)
+    result["card"] = cards[card_codes]
+    result["month"] = (unique_keys % span + first_month).astype("datetime64[M]")
+    result["total_spent"] = totals
+    result["delta"] = delta
+    return result
+
+
+class AnomalyDetector:
+    """Онлайн-детектор необычных трат по паре (категория, карта).
+
+    Для каждой пары хранятся число операций, среднее и сумма квадратов
+    отклонений логарифма суммы (алгоритм Уэлфорда). Оценка операции — это
+    z-оценка относительно уже виденной истории, поэтому каждая новая операция
+    обрабатывается за O(1) без пересчета прошлых данных.
+    """
+
+    def __init__(self, threshold=3.0, min_count=5):
+        self.threshold = threshold
+        self.min_count = min_count
+        self.state = {}
+
+    @staticmethod
+    def _key(category, card):
+        category = "Неизвестно" if pd.isna(category) else category
+        card = "Неизвестно" if pd.isna(card) else card
+        return f"{category}|{card}"
+
+    def _z_score(self, value, count, mean, m2):
+        if count < self.min_count:
+            return np.nan
+        std = np.sqrt(m2 / (count - 1))
+        return float(_z_from_moments(value, mean, std))
+
+    def score(self, operation):
+        """Оценить одну операцию и учесть ее в состоянии; None для поступлений."""
+        payment = operation.get("Сумма платежа", 0)
+        if payment is None or not payment < 0:
+            return None
+        key = self._key(operation.get("Категория"), operation.get("Номер карты"))
+        value = np.log1p(-payment)
+        count, mean, m2 = self.state.get(key, (0, 0.0, 0.0))
+        z = self._z_score(value, count, mean, m2)
+
+        count += 1
+        delta = value - mean
+        mean += delta / count
+        m2 += delta * (value - mean)
+        self.state[key] = (count, mean, m2)
+        return None if np.isnan(z) else float(z)
+
+    def is_anomaly(self, z):
+        return z is not None and not np.isnan(z) and z > self.threshold
+
+    def score_table(self, data):
+        """Оценить все операции таблицы в порядке строк и обновить состояние.
+
+        Каждая строка сравнивается с состоянием до таблицы плюс предыдущими
+        строками той же пары, как при поочередном вызове score. Возвращает
+        массив z-оценок (NaN для поступлений и пар с короткой историей).
+        """
+        payments = data["Сумма платежа"].to_numpy(dtype=float)
+        expense = payments < 0
+        scores = np.full(len(data), np.nan)
+        if not expense.any():
+            return scores
+
+        keys = (
+            data["Категория"].fillna("Неизвестно").astype(str)
+            + "|"
+            + data["Номер карты"].fillna("Неизвестно").astype(str)
+        ).to_numpy()[expense]
+        values = np.log1p(-payments[expense])
+        unique_keys, codes = np.unique(keys, return_inverse=True)
+
+        prior = np.array(
+            [self.state.get(key, (0, 0.0, 0.0)) for key in unique_keys], dtype=float
+        ).reshape(-1, 3)
+        prior_count, prior_mean, prior_m2 = prior[codes].T
+        prior_sum = prior_count * prior_mean
+        prior_sumsq = prior_m2 + prior_count * prior_mean**2
+
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        sorted_values = values[order]
+        group_start = np.concatenate(([True], sorted_codes[1:] != sorted_codes[:-1]))
+
+        def exclusive_cumsum(array):
+            total = np.cumsum(array)
+            positions = np.where(group_start, np.arange(len(array)), 0)
+            starts = np.maximum.accumulate(positions)
+            before = np.where(starts > 0, total[starts - 1], 0.0)
+            return total - array - before
+
+        previous = np.empty(len(values))
+        previous[order] = exclusive_cumsum(np.ones(len(values)))
+        previous_sum = np.empty(len(values))
+        previous_sum[order] = exclusive_cumsum(sorted_values)
+        previous_sumsq = np.empty(len(values))
+        previous_sumsq[order] = exclusive_cumsum(sorted_values**2)
+
+        count = prior_count + previous
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = (prior_sum + previous_sum) / count
+            m2 = np.maximum(prior_sumsq + previous_sumsq - count * mean**2, 0.0)
+            std = np.sqrt(m2 / (count - 1))
+        z = _z_from_moments(values, mean, std)
+        scores[expense] = np.where(count >= self.min_count, z, np.nan)
+
+        totals = np.bincount(codes, minlength=len(unique_keys))
+        sums = np.bincount(codes, weights=values, minlength=len(unique_keys))
+        sumsq = np.bincount(codes, weights=values**2, minlength=len(unique_keys))
+        new_count = prior[:, 0] + totals
+        new_mean = (prior[:, 0] * prior[:, 1] + sums) / new_count
+        new_m2 = np.maximum(
+            prior[:, 2] + prior[:, 0] * prior[:, 1] ** 2 + sumsq
+            - new_count * new_mean**2,
+            0.0,
+        )
+        for key, state in zip(unique_keys, zip(new_count, new_mean, new_m2)):
+            self.state[key] = (int(state[0]), float(state[1]), float(state[2]))
+        return scores
+
+    def save(self, file_path):
+        """Сохранить накопленную статистику детектора в JSON-файл.
+
+        Порог и минимальная история — параметры вызова и не сохраняются.
+        """
+        payload = {"state": {key: list(value) for key, value in self.state.items()}}
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(payload, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, file_path, threshold=3.0, min_count=5):
+        """Загрузить детектор из JSON-файла или создать новый, если файла нет."""
+        detector = cls(threshold, min_count)
+        try:
+            with open(file_path, encoding="utf-8") as file:
+                payload = json.load(file)
+        except FileNotFoundError:
+            return detector
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Ошибка при чтении состояния детектора: {e}")
+            return detector
+        detector.state = {key: tuple(value) for key, value in payload["state"].items()}
+        return detector
+
+
+def detect_anomalies(data, state_path, threshold=3.0):
+    """Найти необычные операции в таблице, обновив сохраненное состояние.
+
+    Возвращает DataFrame аномальных операций со столбцом "anomaly_score".
+    """
+    detector = AnomalyDetector.load(state_path, threshold=threshold)
+    scores = detector.score_table(data)
+    detector.save(state_path)
+    flagged = data.assign(anomaly_score=scores)
+    flagged = flagged[flagged["anomaly_score"] > threshold]
+    logger.info("Найдено необычных операций: " + str(len(flagged)))
+    return flagged
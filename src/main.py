@@ -1,7 +1,12 @@
 from src.views import main_dashboard_handler
 from src.reports import expenses_by_category
 from src.services import search_in_data
-from src.utils import filter_transactions_by_date, find_top_transactions, fetch_currency_and_stocks
+from src.utils import (
+    fetch_currency_and_stocks,
+    filter_transactions_by_date,
+    find_top_transactions,
+    start_quotes_refresher,
+)
 import pandas as pd
 import os
 
@@ -9,6 +14,8 @@ base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 operations_path = os.path.join(base_dir, "data", "operations.xlsx")
 
 def main():
+    settings_path = os.path.join(base_dir, "user_settings.json")
+    stop_refresher = start_quotes_refresher(settings_path)
     df = pd.read_excel(operations_path)
     date_time_input = "2021-12-31 14:30:00"
     print("Home Dashboard:", main_dashboard_handler(date_time_input))
@@ -22,10 +29,10 @@ def main():
     print("Filtered Transactions (by month):", len(filtered_transactions))
     top_transactions = find_top_transactions(filtered_transactions)
     print("Top 5 Transactions:", top_transactions)
-    settings_path = os.path.join(base_dir, "user_settings.json")
     currencies, stocks = fetch_currency_and_stocks(settings_path)
     print("Exchange Rates:", currencies)
     print("Stock Prices:", stocks)
+    stop_refresher.set()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,9 +1,14 @@
+import csv
+import itertools
 import json
 import logging
+import math
 import os
 from datetime import datetime, timedelta
 from functools import wraps
 
+import numpy as np
+import openpyxl
 import pandas as pd
 
 logging.basicConfig(level=logging.INFO)
@@ -53,6 +58,128 @@ def save_to_json(file_name=None):
     return decorator
 
 
+def iter_report_rows(result):
+    """Построчно выдать заголовок и строки отчета или набора операций.
+
+    Принимает JSON-строку, список словарей, словарь или DataFrame. Ряды
+    скользящего отчета ("series") разворачиваются в строки по точкам. Первая
+    выдаваемая строка — заголовок, значения NaN заменяются на None.
+    """
+    if isinstance(result, str):
+        result = json.loads(result)
+    if isinstance(result, pd.DataFrame):
+        yield list(result.columns)
+        for row in result.itertuples(index=False, name=None):
+            yield [None if pd.isna(value) else value for value in row]
+        return
+    if isinstance(result, dict):
+        if "error" in result:
+            raise ValueError(result["error"])
+        if "series" in result:
+            result = _series_rows(result["series"])
+        else:
+            result = result.get("results", [result])
+
+    rows = iter(result)
+    first = next(rows, None)
+    if first is None:
+        return
+    header = list(first)
+    yield header
+    for row in itertools.chain([first], rows):
+        yield [_clean_cell(row.get(column)) for column in header]
+
+
+EXCEL_CELL_LIMIT = 32767
+EXCEL_MAX_ROWS = 1048576
+
+
+def _series_rows(series):
+    """Развернуть ряды скользящего отчета в строки (категория, дата, сумма)."""
+    for category, points in series.items():
+        for point in points:
+            yield {"category": category, **point}
+
+
+def _clean_cell(value):
+    """Привести значение ячейки к виду, пригодному для записи в файл."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _check_excel_cells(row):
+    """Проверить, что строки в ячейках не превышают лимит Excel."""
+    for value in row:
+        if isinstance(value, str) and len(value) > EXCEL_CELL_LIMIT:
+            raise ValueError(
+                "Значение не помещается в ячейку Excel, "
+                "выгрузите отчет в CSV"
+            )
+    return row
+
+
+def export_to_excel(rows, file_name, sheet_name="Отчет"):
+    """Записать строки в .xlsx в потоковом режиме, не держа файл в памяти.
+
+    Если данных больше, чем помещается на лист Excel, создаются следующие
+    листы ("Отчет 2", "Отчет 3", ...) с повтором заголовка.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    rows = iter(rows)
+    header = next(rows, None)
+    sheet = workbook.create_sheet(sheet_name)
+    count = 0
+    try:
+        if header is not None:
+            sheet.append(_check_excel_cells(header))
+            count += 1
+            sheet_rows = 1
+            sheet_number = 1
+            for row in rows:
+                if sheet_rows >= EXCEL_MAX_ROWS:
+                    sheet_number += 1
+                    sheet = workbook.create_sheet(f"{sheet_name} {sheet_number}")
+                    sheet.append(header)
+                    sheet_rows = 1
+                sheet.append(_check_excel_cells(row))
+                sheet_rows += 1
+                count += 1
+    finally:
+        # Потоковые листы закрываются только при сохранении книги.
+        workbook.save(file_name)
+    logger.info(f"Отчет сохранен в файл: {file_name}, строк: {count}")
+    return count
+
+
+def export_to_csv(rows, file_name):
+    """Записать строки в CSV — быстрый путь для очень больших выгрузок."""
+    count = 0
+    with open(file_name, "w", encoding="utf-8-sig", newline="") as file:
+        writer = csv.writer(file, delimiter=";")
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    logger.info(f"Отчет сохранен в файл: {file_name}, строк: {count}")
+    return count
+
+
+def export_report(result, file_name):
+    """Сохранить отчет в .xlsx или .csv в зависимости от расширения файла."""
+    try:
+        rows = iter_report_rows(result)
+        if file_name.lower().endswith(".csv"):
+            return export_to_csv(rows, file_name)
+        return export_to_excel(rows, file_name)
+    except Exception as e:
+        logger.error(f"Ошибка: Не удалось сохранить отчет: {e}")
+        if os.path.exists(file_name):
+            os.remove(file_name)
+        return 0
+
+
 @save_to_json
 def expenses_by_category(file_path, category, start_date=None):
     """Вычисляет расходы по категории за 90 дней от start_date."""
@@ -129,6 +256,101 @@ def expenses_by_category(file_path, category, start_date=None):
         )
 
 
+@save_to_json
+def rolling_expenses_by_category(
+    file_path, category=None, start_date=None, end_date=None, window_days=90
+):
+    """Вычисляет расходы по категориям в окне window_days для каждой даты начала.
+
+    Суммы считаются за один проход: траты сводятся в дневные итоги, по ним
+    строится накопленная сумма, и итог окна [d, d + window_days) равен разности
+    двух её значений. По умолчанию последняя дата начала — та, чье окно
+    заканчивается на последней дате операций; окна, выходящие за конец данных
+    при явном end_date, помечаются полем "partial".
+    """
+    logger.info(f"Вычисление скользящих трат, окно {window_days} дней")
+    try:
+        if int(window_days) <= 0:
+            return json.dumps(
+                {"error": "Длина окна должна быть положительной"},
+                ensure_ascii=False,
+                indent=4,
+            )
+        window_days = int(window_days)
+
+        data = pd.read_excel(file_path)
+        if "Дата операции" not in data.columns:
+            return json.dumps(
+                {"error": "Столбец с датами не найден"}, ensure_ascii=False, indent=4
+            )
+
+        data["date"] = pd.to_datetime(
+            data["Дата операции"], format="%d.%m.%Y %H:%M:%S", dayfirst=True
+        ).dt.normalize()
+        max_date = data["date"].max()
+
+        try:
+            first = (
+                pd.to_datetime(start_date, format="%Y-%m-%d")
+                if start_date
+                else data["date"].min()
+            )
+            last = (
+                pd.to_datetime(end_date, format="%Y-%m-%d")
+                if end_date
+                else max_date - timedelta(days=window_days - 1)
+            )
+        except ValueError:
+            logger.error("Ошибка: Неправильный формат даты")
+            return json.dumps(
+                {"error": "Дата должна быть в формате YYYY-MM-DD"},
+                ensure_ascii=False,
+                indent=4,
+            )
+
+        if category:
+            data = data[data["Категория"] == category]
+        if data.empty or pd.isna(first) or first > last:
+            return json.dumps(
+                {"error": "Нет данных за этот период"}, ensure_ascii=False, indent=4
+            )
+
+        days = pd.date_range(first, last + timedelta(days=window_days - 1))
+        daily = (
+            data.groupby(["date", "Категория"])["Сумма платежа"]
+            .sum()
+            .unstack(fill_value=0)
+            .reindex(days, fill_value=0)
+        )
+        cumulative = daily.cumsum().to_numpy()
+        cumulative = np.vstack([np.zeros((1, cumulative.shape[1])), cumulative])
+        starts = len(days) - window_days + 1
+        totals = cumulative[window_days:window_days + starts] - cumulative[:starts]
+
+        start_labels = days[:starts].strftime("%Y-%m-%d")
+        partial = days[:starts] + timedelta(days=window_days - 1) > max_date
+        series = {}
+        for position, name in enumerate(daily.columns):
+            series[name] = [
+                {
+                    "start_date": label,
+                    "total_spent": round(float(total), 2),
+                    "partial": bool(is_partial),
+                }
+                for label, total, is_partial in zip(
+                    start_labels, totals[:, position], partial
+                )
+            ]
+        result = {"window_days": window_days, "series": series}
+        return json.dumps(result, ensure_ascii=False, indent=4)
+
+    except Exception as e:
+        logger.error(f"Ошибка: Проблема с обработкой данных: {e}")
+        return json.dumps(
+            {"error": "Не удалось обработать данные"}, ensure_ascii=False, indent=4
+        )
+
+
 if __name__ == "__main__":
     start_date = "2025-01-01"
     result = expenses_by_category("data/operations.xlsx", "", start_date)
@@ -1,6 +1,11 @@
 import json
 import logging
+import os
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 import pandas as pd
 
 logging.basicConfig(level=logging.INFO)
@@ -31,11 +36,152 @@ def read_excel_file(file_path):
     return None
 
 
-def search_in_data(search_text, file_path):
-    """Искать строки с текстом в Excel-файле, вернуть результаты в JSON."""
+REGEX_SHARD_SIZE = 20000
+
+
+def _regex_shard_matches(shard, pattern):
+    """Вернуть позиции строк шарда, в текстовых столбцах которых есть совпадение."""
+    mask = np.zeros(len(shard), dtype=bool)
+    for column in shard.columns:
+        values = shard[column].astype(str)
+        mask |= values.str.contains(pattern, case=False, regex=True).to_numpy(
+            dtype=bool
+        )
+    return np.flatnonzero(mask)
+
+
+def regex_search_positions(data, pattern, columns=None, limit=None, workers=None):
+    """Найти позиции строк, совпадающих с регулярным выражением.
+
+    Таблица делится на шарды по REGEX_SHARD_SIZE строк, которые проверяются
+    параллельно в пуле процессов. Результаты собираются в исходном порядке, а
+    после набора limit совпадений оставшиеся шарды отменяются.
+    """
+    re.compile(pattern)
+    if columns is None:
+        columns = [
+            column
+            for column in data.columns
+            if not pd.api.types.is_numeric_dtype(data[column])
+        ]
+    text = data[list(columns)]
+    bounds = range(0, len(text), REGEX_SHARD_SIZE)
+
+    positions = []
+    if len(bounds) <= 1 or workers == 1:
+        for start in bounds:
+            shard = text.iloc[start:start + REGEX_SHARD_SIZE]
+            positions.extend(_regex_shard_matches(shard, pattern) + start)
+            if limit is not None and len(positions) >= limit:
+                break
+        return positions[:limit]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _regex_shard_matches,
+                text.iloc[start:start + REGEX_SHARD_SIZE],
+                pattern,
+            )
+            for start in bounds
+        ]
+        for start, future in zip(bounds, futures):
+            positions.extend(future.result() + start)
+            if limit is not None and len(positions) >= limit:
+                for pending in futures:
+                    pending.cancel()
+                break
+    return positions[:limit]
+
+
+TRANSLITERATION = str.maketrans(
+    {
+        "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+        "ж": "zh", "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m",
+        "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+        "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch",
+        "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    }
+)
+
+
+def _normalize_text(text):
+    """Привести текст к нижнему регистру и записать латиницей.
+
+    Кириллица транслитерируется, а варианты латинского написания ("kh" и "h",
+    "w" и "v") сводятся к одному, поэтому "Kolkhoz" и "Колхоз" совпадают.
+    """
+    text = str(text).strip().lower().translate(TRANSLITERATION)
+    return text.replace("kh", "h").replace("w", "v")
+
+
+def _trigrams(text):
+    """Вернуть множество триграмм текста с учетом границ слова."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def build_merchant_index(descriptions):
+    """Построить триграммный индекс по уникальным описаниям операций."""
+    names = sorted({value for value in descriptions if isinstance(value, str)})
+    postings = defaultdict(list)
+    sizes = []
+    for position, name in enumerate(names):
+        grams = _trigrams(_normalize_text(name))
+        sizes.append(len(grams))
+        for gram in grams:
+            postings[gram].append(position)
+    return {"names": names, "sizes": sizes, "postings": dict(postings)}
+
+
+def fuzzy_match(index, query, top_n=5, min_similarity=0.4):
+    """Найти в индексе описания, похожие на запрос, по коэффициенту Дайса.
+
+    Сравниваются только описания, имеющие с запросом хотя бы одну общую
+    триграмму. Вернуть список (описание, сходство) по убыванию сходства.
+    """
+    grams = _trigrams(_normalize_text(query))
+    shared = Counter()
+    for gram in grams:
+        shared.update(index["postings"].get(gram, ()))
+    scored = []
+    for position, count in shared.items():
+        similarity = 2 * count / (len(grams) + index["sizes"][position])
+        if similarity >= min_similarity:
+            scored.append((index["names"][position], round(similarity, 3)))
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:top_n]
+
+
+_merchant_indexes = {}
+
+
+def _get_merchant_index(file_path, data):
+    """Вернуть индекс описаний для файла, перестраивая его при изменении файла."""
+    key = (os.path.abspath(file_path), os.path.getmtime(file_path))
+    index = _merchant_indexes.get(key)
+    if index is None:
+        index = build_merchant_index(data["Описание"].unique())
+        _merchant_indexes.clear()
+        _merchant_indexes[key] = index
+    return index
+
+
+def search_in_data(
+    search_text, file_path, regex=False, limit=None, workers=None, fuzzy=False
+):
+    """Искать строки с текстом в Excel-файле, вернуть результаты в JSON.
+
+    При regex=True search_text считается регулярным выражением (без учета
+    регистра), а поиск по текстовым столбцам идет параллельно по шардам.
+    При fuzzy=True ищутся описания, похожие на search_text с учетом опечаток,
+    и возвращаются все операции с найденными описаниями.
+    """
     logger.info("Поиск: " + search_text)
     try:
-        search_text = search_text.strip().lower()
+        search_text = search_text.strip()
+        if not regex:
+            search_text = search_text.lower()
         data = read_excel_file(file_path)
         if data is None:
             logger.error("Файл не загружен, поиск невозможен")
@@ -44,20 +190,49 @@ def search_in_data(search_text, file_path):
             )
 
         matched_rows = []
-        for index, row in data.iterrows():
-            found = False
-            for value in row:
-                if str(value).lower().find(search_text) != -1:
-                    found = True
-                    break
-            if found:
-                matched_rows.append(row.to_dict())
+        matches = None
+        if fuzzy:
+            index = _get_merchant_index(file_path, data)
+            matches = fuzzy_match(index, search_text)
+            names = [name for name, _ in matches]
+            found = data[data["Описание"].isin(names)]
+            if limit is not None:
+                found = found.head(limit)
+            matched_rows = found.to_dict(orient="records")
+        elif regex:
+            try:
+                positions = regex_search_positions(
+                    data, search_text, limit=limit, workers=workers
+                )
+            except re.error as e:
+                logger.error(f"Неверное регулярное выражение: {e}")
+                return json.dumps(
+                    {"error": f"Неверное регулярное выражение: {e}"},
+                    ensure_ascii=False,
+                )
+            matched_rows = data.iloc[positions].to_dict(orient="records")
+        else:
+            for index, row in data.iterrows():
+                found = False
+                for value in row:
+                    if str(value).lower().find(search_text) != -1:
+                        found = True
+                        break
+                if found:
+                    matched_rows.append(row.to_dict())
+                    if limit is not None and len(matched_rows) >= limit:
+                        break
         logger.info("Найдено совпадений: " + str(len(matched_rows)))
         response = {
             "query": search_text,
             "results_count": len(matched_rows),
             "results": matched_rows,
         }
+        if matches is not None:
+            response["matches"] = [
+                {"description": name, "similarity": similarity}
+                for name, similarity in matches
+            ]
         return json.dumps(response, ensure_ascii=False)
     except Exception as e:
         logger.error(f"Ошибка при поиске: {str(e)}")
@@ -66,6 +241,245 @@ def search_in_data(search_text, file_path):
         )
 
 
+def _text_mask(data, text, rows):
+    """Вернуть маску строк из rows, в любом столбце которых встречается текст.
+
+    Проверяются только строки, отмеченные в rows и еще не найденные в
+    предыдущих столбцах.
+    """
+    found = np.zeros(len(data), dtype=bool)
+    for column in data.columns:
+        pending = rows & ~found
+        if not pending.any():
+            break
+        values = data[column].to_numpy()[pending]
+        matched = (
+            pd.Series(values).astype(str).str.lower().str.contains(text, regex=False)
+        )
+        found[np.flatnonzero(pending)[matched.to_numpy(dtype=bool)]] = True
+    return found
+
+
+def query_data(
+    file_path,
+    text=None,
+    date_from=None,
+    date_to=None,
+    categories=None,
+    card=None,
+    amount_min=None,
+    amount_max=None,
+    columns=None,
+):
+    """Выполнить структурированный поиск по операциям, вернуть результаты в JSON.
+
+    Фильтры собираются в одну булеву маску от дешевых и селективных к дорогим:
+    сначала карта и категории, затем диапазон сумм, даты и в конце текстовый
+    поиск. Даты и текст проверяются только в строках, прошедших предыдущие
+    фильтры, а строки с нужными столбцами columns выбираются один раз в конце.
+    """
+    logger.info("Структурированный поиск в файле: " + file_path)
+    try:
+        try:
+            start = pd.to_datetime(date_from, format="%Y-%m-%d") if date_from else None
+            end = pd.to_datetime(date_to, format="%Y-%m-%d") if date_to else None
+        except ValueError as e:
+            logger.error(f"Ошибка в параметрах поиска: {str(e)}")
+            return json.dumps(
+                {"error": "Дата должна быть в формате YYYY-MM-DD"}, ensure_ascii=False
+            )
+        if isinstance(categories, str):
+            categories = [categories]
+
+        data = read_excel_file(file_path)
+        if data is None:
+            logger.error("Файл не загружен, поиск невозможен")
+            return json.dumps(
+                {"error": "Не удалось выполнить поиск"}, ensure_ascii=False
+            )
+
+        if columns:
+            missing = [column for column in columns if column not in data.columns]
+            if missing:
+                return json.dumps(
+                    {"error": f"Столбцы не найдены: {', '.join(missing)}"},
+                    ensure_ascii=False,
+                )
+
+        mask = np.ones(len(data), dtype=bool)
+        if card is not None:
+            mask &= (data["Номер карты"] == card).to_numpy()
+        if categories:
+            mask &= data["Категория"].isin(list(categories)).to_numpy()
+        amounts = data["Сумма платежа"].to_numpy(dtype=float)
+        if amount_min is not None:
+            mask &= amounts >= amount_min
+        if amount_max is not None:
+            mask &= amounts <= amount_max
+
+        if start is not None or end is not None:
+            rows = np.flatnonzero(mask)
+            dates = pd.to_datetime(
+                data["Дата операции"].to_numpy()[rows],
+                format="%d.%m.%Y %H:%M:%S",
+                errors="coerce",
+            )
+            keep = ~dates.isna()
+            if start is not None:
+                keep &= dates >= start
+            if end is not None:
+                keep &= dates < end + pd.Timedelta(days=1)
+            mask[rows[~keep]] = False
+
+        if text:
+            text = text.strip().lower()
+            mask = _text_mask(data, text, mask)
+
+        selected = list(columns) if columns else data.columns
+        matched_rows = data.loc[mask, selected].to_dict(orient="records")
+        logger.info("Найдено совпадений: " + str(len(matched_rows)))
+        response = {
+            "query": text or "",
+            "results_count": len(matched_rows),
+            "results": matched_rows,
+        }
+        return json.dumps(response, ensure_ascii=False)
+    except Exception as e:
+        logger.error(f"Ошибка при поиске: {str(e)}")
+        return json.dumps(
+            {"error": f"Не удалось выполнить поиск: {str(e)}"}, ensure_ascii=False
+        )
+
+
+FINGERPRINT_COLUMNS = [
+    "Дата операции",
+    "Дата платежа",
+    "Номер карты",
+    "Статус",
+    "Сумма операции",
+    "Валюта операции",
+    "Сумма платежа",
+    "Категория",
+    "MCC",
+    "Описание",
+]
+
+
+FINGERPRINT_DATE_FORMATS = {
+    "Дата операции": "%d.%m.%Y %H:%M:%S",
+    "Дата платежа": "%d.%m.%Y",
+}
+FINGERPRINT_NUMBER_COLUMNS = ["Сумма операции", "Сумма платежа", "MCC"]
+
+
+def _normalize_fingerprint_column(values, column):
+    """Привести столбец к виду, не зависящему от типа, выбранного pandas."""
+    if column in FINGERPRINT_DATE_FORMATS:
+        if pd.api.types.is_datetime64_any_dtype(values):
+            parsed = values
+        else:
+            parsed = pd.to_datetime(
+                values, format=FINGERPRINT_DATE_FORMATS[column], errors="coerce"
+            )
+            unparsed = parsed.isna() & values.notna()
+            if unparsed.any():
+                parsed[unparsed] = pd.to_datetime(
+                    values[unparsed].astype(str),
+                    format="mixed",
+                    dayfirst=True,
+                    errors="coerce",
+                )
+        parsed = parsed.astype("datetime64[ns]")
+        return parsed.to_numpy().view(np.int64)
+    if column in FINGERPRINT_NUMBER_COLUMNS:
+        return pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+    return values.fillna("").astype(str).str.strip().to_numpy(dtype=object)
+
+
+def operation_fingerprints(data):
+    """Вернуть массив uint64-отпечатков операций.
+
+    Перед хешированием даты разбираются, числа приводятся к float64, а строки
+    очищаются от пробелов, поэтому отпечаток не зависит от того, какой тип
+    pandas выбрал при чтении выгрузки. В отпечаток входит номер повтора
+    одинаковой строки внутри выгрузки, поэтому две настоящие одинаковые
+    покупки не схлопываются в одну.
+    """
+    columns = [column for column in FINGERPRINT_COLUMNS if column in data.columns]
+    normalized = pd.DataFrame(
+        {
+            column: _normalize_fingerprint_column(data[column], column)
+            for column in columns
+        }
+    )
+    base = pd.util.hash_pandas_object(normalized, index=False)
+    occurrence = base.groupby(base).cumcount()
+    combined = pd.DataFrame(
+        {"base": base.to_numpy(), "occurrence": occurrence.to_numpy()}
+    )
+    return pd.util.hash_pandas_object(combined, index=False).to_numpy()
+
+
+def _load_fingerprints(fingerprints_file, target_file):
+    """Загрузить отсортированный набор отпечатков или построить его по файлу."""
+    if os.path.exists(fingerprints_file):
+        return np.load(fingerprints_file)
+    if os.path.exists(target_file):
+        logger.info("Набор отпечатков не найден, строим по файлу: " + target_file)
+        return np.unique(operation_fingerprints(pd.read_excel(target_file)))
+    return np.array([], dtype=np.uint64)
+
+
+def merge_operations(new_file, target_file, fingerprints_file=None):
+    """Добавить операции из новой выгрузки в общий файл без повторов.
+
+    Отпечатки новых строк сверяются с сохраненным отсортированным набором
+    (бинарный поиск), поэтому проверка стоит O(новых строк). Вернуть JSON с
+    числом добавленных и отброшенных строк и самими отброшенными строками.
+    """
+    logger.info("Слияние выгрузки " + new_file + " с " + target_file)
+    if fingerprints_file is None:
+        fingerprints_file = target_file + ".fingerprints.npy"
+    try:
+        new_data = read_excel_file(new_file)
+        if new_data is None:
+            return json.dumps(
+                {"error": "Не удалось загрузить новую выгрузку"}, ensure_ascii=False
+            )
+
+        known = _load_fingerprints(fingerprints_file, target_file)
+        fingerprints = operation_fingerprints(new_data)
+        duplicate = np.zeros(len(new_data), dtype=bool)
+        if len(known):
+            positions = np.searchsorted(known, fingerprints)
+            positions = np.minimum(positions, len(known) - 1)
+            duplicate = known[positions] == fingerprints
+
+        added = new_data[~duplicate]
+        dropped = new_data[duplicate]
+        if os.path.exists(target_file):
+            merged = pd.concat([pd.read_excel(target_file), added], ignore_index=True)
+        else:
+            merged = added
+        merged.to_excel(target_file, index=False)
+        np.save(fingerprints_file, np.union1d(known, fingerprints[~duplicate]))
+
+        logger.info(
+            f"Добавлено строк: {len(added)}, отброшено повторов: {len(dropped)}"
+        )
+        response = {
+            "added_count": len(added),
+            "dropped_count": len(dropped),
+            "dropped": dropped.to_dict(orient="records"),
+        }
+        return json.dumps(response, ensure_ascii=False)
+    except Exception as e:
+        logger.error(f"Ошибка при слиянии выгрузок: {str(e)}")
+        return json.dumps(
+            {"error": f"Не удалось объединить выгрузки: {str(e)}"}, ensure_ascii=False
+        )
+
+
 if __name__ == "__main__":
     user_input = input("Введите запрос для поиска: ").title()
     search_result = search_in_data(user_input, "../data/operations.xlsx")
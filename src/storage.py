@@ -0,0 +1,143 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+db_path = os.path.join(base_dir, "data", "quotes.sqlite3")
+
+_connections = {}
+_lock = threading.Lock()
+
+
+def get_connection(path=None):
+    """Вернуть общее соединение с локальной базой котировок, создав схему.
+
+    Если базу открыть не удалось, вернуть None: кеш котировок не обязателен.
+    """
+    path = path or db_path
+    with _lock:
+        conn = _connections.get(path)
+        if conn is None:
+            try:
+                conn = sqlite3.connect(path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS quotes ("
+                    " symbol TEXT NOT NULL,"
+                    " date TEXT NOT NULL,"
+                    " value REAL NOT NULL,"
+                    " updated_at REAL NOT NULL,"
+                    " PRIMARY KEY (symbol, date)"
+                    ") WITHOUT ROWID"
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Не удалось открыть базу котировок {path}: {e}")
+                return None
+            _connections[path] = conn
+        return conn
+
+
+def close_connections():
+    """Закрыть все открытые соединения с базой котировок."""
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+
+
+def upsert_quotes(quotes, path=None):
+    """Сохранить котировки (symbol, date, value) одной транзакцией.
+
+    Значение за уже сохраненную дату перезаписывается. Ошибки записи только
+    логируются; возвращается число сохраненных строк.
+    """
+    try:
+        now = time.time()
+        rows = [(symbol, date, float(value), now) for symbol, date, value in quotes]
+        if not rows:
+            return 0
+        conn = get_connection(path)
+        if conn is None:
+            return 0
+        with _lock, conn:
+            conn.executemany(
+                "INSERT INTO quotes (symbol, date, value, updated_at)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (symbol, date) DO UPDATE SET"
+                " value = excluded.value, updated_at = excluded.updated_at",
+                rows,
+            )
+        return len(rows)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        logger.error(f"Ошибка при сохранении котировок: {e}")
+        return 0
+
+
+def get_latest(symbols, max_age=None, path=None):
+    """Вернуть словарь {symbol: value} с последними сохраненными значениями.
+
+    Если задан max_age (в секундах), значения старше него не возвращаются.
+    Ошибка чтения считается промахом кеша.
+    """
+    oldest = time.time() - max_age if max_age is not None else 0
+    latest = {}
+    try:
+        conn = get_connection(path)
+        if conn is None:
+            return latest
+        with _lock:
+            for symbol in symbols:
+                row = conn.execute(
+                    "SELECT value, updated_at FROM quotes WHERE symbol = ?"
+                    " ORDER BY date DESC LIMIT 1",
+                    (symbol,),
+                ).fetchone()
+                if row is not None and row[1] >= oldest:
+                    latest[symbol] = row[0]
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при чтении котировок: {e}")
+        return {}
+    return latest
+
+
+def get_history(symbol, start_date=None, end_date=None, path=None):
+    """Вернуть список (date, value) по символу за период в формате YYYY-MM-DD."""
+    try:
+        conn = get_connection(path)
+        if conn is None:
+            return []
+        with _lock:
+            return conn.execute(
+                "SELECT date, value FROM quotes WHERE symbol = ?"
+                " AND date >= ? AND date <= ? ORDER BY date",
+                (symbol, start_date or "", end_date or "9999-12-31"),
+            ).fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при чтении котировок: {e}")
+        return []
+
+
+def start_background_refresh(refresh, interval=3600):
+    """Запустить фоновый поток, вызывающий refresh каждые interval секунд.
+
+    Возвращает threading.Event, установка которого останавливает поток.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.is_set():
+            try:
+                refresh()
+            except Exception as e:
+                logger.error(f"Ошибка при фоновом обновлении котировок: {e}")
+            stop.wait(interval)
+
+    thread = threading.Thread(target=run, name="quotes-refresh", daemon=True)
+    thread.start()
+    return stop
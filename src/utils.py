@@ -4,12 +4,15 @@ import os
 import sys
 from datetime import datetime, timedelta
 
+import numpy as np
 import pandas as pd
 import requests
 from dotenv import load_dotenv
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from src import storage  # noqa: E402
+
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
@@ -103,6 +106,39 @@ def get_operations_info(operations):
     return card_numbers, amounts_list, cashback_list
 
 
+def get_operations_arrays(operations):
+    """Колоночный вариант get_operations_info: вернуть словарь массивов NumPy.
+
+    Принимает DataFrame или список словарей операций. Ключи: "cards",
+    "amounts", "cashback", "payments" (знаковая 'Сумма платежа', при ее отсутствии
+    суммы считаются расходами) и "dates".
+    """
+    data = operations
+    if not isinstance(data, pd.DataFrame):
+        data = pd.DataFrame.from_records(list(operations))
+
+    def column(name, default):
+        if name not in data.columns:
+            return pd.Series(default, index=data.index)
+        return data[name].fillna(default)
+
+    dates = pd.to_datetime(
+        column("Дата операции", ""), format="%d.%m.%Y %H:%M:%S", errors="coerce"
+    )
+    amounts = column("Сумма операции с округлением", 0).to_numpy(dtype=float)
+    if "Сумма платежа" in data.columns:
+        payments = column("Сумма платежа", 0).to_numpy(dtype=float)
+    else:
+        payments = -amounts
+    return {
+        "cards": column("Номер карты", "Неизвестно").astype(str).to_numpy(),
+        "amounts": amounts,
+        "cashback": column("Кэшбэк", 0).to_numpy(dtype=float),
+        "payments": payments,
+        "dates": dates.to_numpy(dtype="datetime64[ns]"),
+    }
+
+
 def find_top_transactions(operations):
     """Вернуть топ-5 операций с наибольшими суммами."""
     try:
@@ -151,6 +187,13 @@ def fetch_currency_and_stocks(settings_path):
                 {"stock": stock["symbol"], "price": float(stock["close"])}
             )
 
+        today = datetime.now().strftime("%Y-%m-%d")
+        quotes = [(f"{c['currency']}RUB", today, c["rate"]) for c in currencies_list]
+        for stock in resp_stocks.get("data", []):
+            date = str(stock.get("date") or today)[:10]
+            quotes.append((stock["symbol"], date, float(stock["close"])))
+        storage.upsert_quotes(quotes)
+
         return currencies_list, stocks_list
 
     except (FileNotFoundError, json.JSONDecodeError) as e:
@@ -165,6 +208,13 @@ def fetch_currency_and_stocks(settings_path):
         return [], []
 
 
+def start_quotes_refresher(settings_path, interval=1800):
+    """Запустить фоновое обновление локальной базы курсов и цен акций."""
+    return storage.start_background_refresh(
+        lambda: fetch_currency_and_stocks(settings_path), interval
+    )
+
+
 def sort_transactions_by_month(transactions, date=None):
     """Отфильтровать DataFrame с транзакциями за последние 90 дней от даты."""
     try:
@@ -187,3 +237,104 @@ def sort_transactions_by_month(transactions, date=None):
     except (ValueError, KeyError, TypeError) as e:
         logger.error(f"Ошибка при фильтрации транзакций по месяцам: {str(e)}")
         return pd.DataFrame()
+
+
+def load_rates_table(currencies, start_date=None, end_date=None):
+    """Прочитать дневные курсы валют к рублю из локальной базы котировок.
+
+    Вернуть DataFrame со столбцами date, currency и rate (рублей за единицу).
+    """
+    rows = []
+    for currency in currencies:
+        for date, rate in storage.get_history(f"{currency}RUB", start_date, end_date):
+            rows.append({"date": date, "currency": currency, "rate": rate})
+    rates = pd.DataFrame(rows, columns=["date", "currency", "rate"])
+    rates["date"] = pd.to_datetime(rates["date"], format="%Y-%m-%d")
+    return rates
+
+
+def fetch_historical_rates(currencies, start_date, end_date):
+    """Загрузить дневные курсы валют к рублю за период в локальную базу котировок."""
+    quotes = []
+    try:
+        for currency in currencies:
+            url = (
+                f"http://api.currencylayer.com/timeframe?access_key={currency_api_key}"
+                f"&start_date={start_date}&end_date={end_date}"
+                f"&source={currency}&currencies=RUB"
+            )
+            resp = requests.get(url).json()
+            for day, day_quotes in resp.get("quotes", {}).items():
+                rate = day_quotes.get(f"{currency}RUB")
+                if rate:
+                    quotes.append((f"{currency}RUB", day, rate))
+    except requests.RequestException as e:
+        logger.error(f"Ошибка HTTP-запроса: {e}")
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error(f"Ошибка обработки данных: {e}")
+
+    storage.upsert_quotes(quotes)
+    return load_rates_table(currencies, start_date, end_date)
+
+
+def convert_amounts(
+    transactions, rates, currencies=("USD", "EUR"), date_column="Дата операции"
+):
+    """Пересчитать 'Сумма платежа' в валюты по курсу на дату операции.
+
+    Курсы (рублей за единицу валюты) разворачиваются в широкую таблицу по
+    датам и присоединяются к операциям одним merge_asof по отсортированной
+    дате, поэтому для каждой операции берется последний известный курс на ее
+    дату. Сумма сначала переводится в рубли по курсу 'Валюта платежа', затем
+    в целевую валюту; если курса нет, результат — NaN. Результат содержит
+    столбцы 'Сумма платежа <валюта>' в исходном порядке строк.
+
+    Если столбец date_column уже имеет тип datetime64, строки дат повторно не
+    разбираются — для повторных пересчетов удобно передать заранее
+    разобранный столбец.
+    """
+    result = transactions.copy()
+    currencies = list(currencies)
+    if "Валюта платежа" in result.columns:
+        payment_currency = result["Валюта платежа"].fillna("RUB")
+    else:
+        payment_currency = pd.Series("RUB", index=result.index)
+    codes, uniques = pd.factorize(payment_currency)
+    known = sorted((set(currencies) | set(uniques)) - {"RUB"})
+
+    table = rates[rates["currency"].isin(known)]
+    wide = table.pivot_table(index="date", columns="currency", values="rate")
+    wide = wide.reindex(columns=known).sort_index().ffill()
+    wide["RUB"] = 1.0
+    wide.index = pd.to_datetime(wide.index).astype("datetime64[ns]")
+    wide.index.name = "_rate_date"
+
+    dates = result[date_column]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format="%d.%m.%Y %H:%M:%S", errors="coerce")
+    dates = dates.astype("datetime64[ns]")
+    left = pd.DataFrame(
+        {"_op_date": dates.dt.normalize(), "_row": range(len(result))}
+    )
+    valid = left["_op_date"].notna()
+    merged = pd.merge_asof(
+        left[valid].sort_values("_op_date"),
+        wide.reset_index(),
+        left_on="_op_date",
+        right_on="_rate_date",
+        direction="backward",
+    )
+
+    rows = merged["_row"].to_numpy()
+    matrix = merged[list(wide.columns)].to_numpy(dtype=float)
+    column_of = {currency: position for position, currency in enumerate(wide.columns)}
+    lookup = np.array([column_of[currency] for currency in uniques], dtype=np.int64)
+    payment_rates = matrix[np.arange(len(rows)), lookup[codes[rows]]]
+
+    amounts = result["Сумма платежа"].to_numpy(dtype=float)
+    amounts_rub = amounts[rows] * payment_rates
+    for currency in currencies:
+        converted = np.full(len(result), np.nan)
+        converted[rows] = amounts_rub / matrix[:, column_of[currency]]
+        result[f"Сумма платежа {currency}"] = converted.round(2)
+    return result
@@ -1,14 +1,24 @@
+import heapq
 import json
 import logging
 import os
+import sys
 from datetime import datetime
 
 import pandas as pd
 import requests
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import storage  # noqa: E402
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Курсы валют хранятся как "<валюта>RUB" (рублей за единицу), акции — по тикеру,
+# так же, как их сохраняет utils.fetch_currency_and_stocks.
+CACHE_MAX_AGE = 3600
+
 def generate_time_based_greeting():
     hour = datetime.now().hour
     if hour >= 5 and hour < 12:
@@ -44,14 +54,31 @@ def get_exchange_rates(currency_list):
             print("Ошибка: Не удалось получить данные с API")
             return rates
         data = response.json()
+        rub_rate = data["rates"].get("RUB")
         for currency in currency_list:
-            rate = data["rates"].get(currency, "N/A")
+            rate = data["rates"].get(currency)
+            if rub_rate and rate:
+                rate = round(rub_rate / rate, 2)
+            else:
+                rate = "N/A"
             rates.append({"currency": currency, "rate": rate})
+        today = datetime.now().strftime("%Y-%m-%d")
+        storage.upsert_quotes(
+            (f"{item['currency']}RUB", today, item["rate"])
+            for item in rates
+            if isinstance(item["rate"], (int, float))
+        )
         return rates
     except Exception as e:
         logger.error(f"Ошибка при загрузке курсов валют: {str(e)}")
         return rates
 
+def get_cached_exchange_rates(currency_list, max_age=CACHE_MAX_AGE):
+    latest = storage.get_latest([f"{c}RUB" for c in currency_list], max_age)
+    if len(latest) != len(currency_list):
+        return []
+    return [{"currency": c, "rate": latest[f"{c}RUB"]} for c in currency_list]
+
 def retrieve_stock_data(stock_list, zuvor=None):
     stocks = zuvor if zuvor is not None else []
     try:
@@ -67,6 +94,12 @@ def retrieve_stock_data(stock_list, zuvor=None):
         logger.error(f"Ошибка при загрузке цен акций: {str(e)}")
         return stocks
 
+def get_cached_stock_data(stock_list, max_age=CACHE_MAX_AGE):
+    latest = storage.get_latest(stock_list, max_age)
+    if len(latest) != len(stock_list):
+        return []
+    return [{"stock": stock, "price": latest[stock]} for stock in stock_list]
+
 def analyze_transactions(transactions_file, date_start, date_end):
     result = {"card_summary": [], "top_five_transactions": []}
     if not os.path.exists(transactions_file):
@@ -91,6 +124,97 @@ def analyze_transactions(transactions_file, date_start, date_end):
         logger.error(f"Ошибка при обработке операций: {str(e)}")
         return result
 
+def _card_entries(card_totals):
+    cards_list = []
+    for card, (expense, cashback) in card_totals.items():
+        cards_list.append(
+            {
+                "card_ending": str(card)[-4:],
+                "total_expense": round(expense, 2),
+                "cashback_earned": round(cashback, 2),
+            }
+        )
+    return cards_list
+
+def precompute_dashboards(
+    transactions_file, date_start, date_end, output_file, top_n=5
+):
+    if not os.path.exists(transactions_file):
+        logger.error("Файл операций не найден!")
+        print("Ошибка: Файл " + transactions_file + " не найден")
+        return 0
+    try:
+        first_day = pd.to_datetime(date_start, format="%Y-%m-%d")
+        last_day = pd.to_datetime(date_end, format="%Y-%m-%d")
+        month_start = first_day.replace(day=1)
+
+        data = pd.read_excel(transactions_file)
+        data["Operation Date"] = pd.to_datetime(data["Дата операции"], dayfirst=True)
+        data["day"] = data["Operation Date"].dt.normalize()
+        data = data[(data["day"] >= month_start) & (data["day"] <= last_day)]
+        data = data.sort_values("Operation Date", kind="stable")
+
+        daily_cards = (
+            data.groupby(["day", "Номер карты"])[["Сумма платежа", "Кэшбэк"]]
+            .sum()
+            .groupby(level="day")
+        )
+        daily_cards = {day: group.droplevel("day") for day, group in daily_cards}
+        daily_ops = {day: group for day, group in data.groupby("day")}
+
+        card_totals = {}
+        top = []
+        sequence = 0
+        written = 0
+        with open(output_file, "w", encoding="utf-8") as file:
+            for day in pd.date_range(month_start, last_day):
+                if day.day == 1:
+                    card_totals = {}
+                    top = []
+
+                if day in daily_cards:
+                    for card, row in daily_cards[day].iterrows():
+                        expense, cashback = card_totals.get(card, (0.0, 0.0))
+                        card_totals[card] = (
+                            expense + row["Сумма платежа"],
+                            cashback + row["Кэшбэк"],
+                        )
+                if day in daily_ops:
+                    for transaction in daily_ops[day].to_dict(orient="records"):
+                        item = (transaction["Сумма платежа"], -sequence, transaction)
+                        sequence += 1
+                        if len(top) < top_n:
+                            heapq.heappush(top, item)
+                        elif item[:2] > top[0][:2]:
+                            heapq.heapreplace(top, item)
+
+                if day < first_day:
+                    continue
+                transactions_list = []
+                for _, _, transaction in sorted(top, key=lambda x: x[:2], reverse=True):
+                    transactions_list.append(
+                        {
+                            "date": transaction["Operation Date"].strftime("%d.%m.%Y"),
+                            "amount": transaction["Сумма платежа"],
+                            "category": transaction["Категория"],
+                            "description": transaction["Описание"],
+                        }
+                    )
+                line = {
+                    "date": day.strftime("%Y-%m-%d"),
+                    "cards": _card_entries(card_totals),
+                    "top_transactions": transactions_list,
+                }
+                file.write(json.dumps(line, ensure_ascii=False) + "\n")
+                written += 1
+
+        logger.info("Сохранено дней в " + output_file + ": " + str(written))
+        return written
+
+    except Exception as e:
+        logger.error(f"Ошибка при предварительном расчете дашбордов: {str(e)}")
+        return 0
+
 def main_dashboard_handler(date_time_input):
     try:
         date = datetime.strptime(date_time_input, "%Y-%m-%d %H:%M:%S")
@@ -102,8 +226,12 @@ def main_dashboard_handler(date_time_input):
         operations_path = os.path.join(base_dir, "data", "operations.xlsx")
 
         config = retrieve_user_config(settings_path)
-        rates = get_exchange_rates(config["user_currencies"])
-        stocks = retrieve_stock_data(config["user_stocks"])
+        rates = get_cached_exchange_rates(config["user_currencies"])
+        if not rates:
+            rates = get_exchange_rates(config["user_currencies"])
+        stocks = get_cached_stock_data(config["user_stocks"])
+        if not stocks:
+            stocks = retrieve_stock_data(config["user_stocks"])
         transactions = analyze_transactions(operations_path, start, end)
 
         cards_list = []
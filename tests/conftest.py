@@ -0,0 +1,10 @@
+import pytest
+
+from src import storage
+
+
+@pytest.fixture(autouse=True)
+def temp_quotes_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "db_path", str(tmp_path / "quotes.sqlite3"))
+    yield
+    storage.close_connections()
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import analytics
+
+
+@pytest.fixture
+def operations():
+    return pd.DataFrame(
+        {
+            "Дата операции": [
+                "01.01.2021 10:00:00",
+                "15.01.2021 10:00:00",
+                "03.02.2021 10:00:00",
+                "10.01.2021 10:00:00",
+                "20.03.2021 10:00:00",
+                "21.03.2021 10:00:00",
+            ],
+            "Номер карты": ["*1111", "*1111", "*1111", "*2222", "*2222", None],
+            "Сумма платежа": [-100.0, -300.0, -50.0, -40.0, 500.0, -10.0],
+            "Сумма операции с округлением": [100.0, 300.0, 50.0, 40.0, 500.0, 10.0],
+            "Кэшбэк": [1.0, 3.0, np.nan, 2.0, np.nan, np.nan],
+        }
+    )
+
+
+def test_card_statistics(operations):
+    stats = analytics.card_statistics(operations, percentiles=(25,))
+    assert list(stats["card"]) == ["*1111", "*2222", "Неизвестно"]
+    first = stats[0]
+    assert first["total_spent"] == 450.0
+    assert first["count"] == 3
+    assert first["median"] == 100.0
+    assert first["p25"] == 75.0
+    assert first["cashback_rate"] == pytest.approx(4.0 / 450.0)
+    assert stats[1]["count"] == 1
+    assert stats[1]["total_spent"] == 40.0
+
+
+def test_card_statistics_from_records(operations):
+    records = operations.to_dict(orient="records")
+    stats = analytics.card_statistics(records)
+    assert stats["total_spent"].sum() == 500.0
+
+
+def test_monthly_card_deltas(operations):
+    deltas = analytics.monthly_card_deltas(operations)
+    first_card = deltas[deltas["card"] == "*1111"]
+    assert list(first_card["total_spent"]) == [400.0, 50.0]
+    assert np.isnan(first_card["delta"][0])
+    assert first_card["delta"][1] == -350.0
+    assert first_card["month"][1] == np.datetime64("2021-02")
+    second_card = deltas[deltas["card"] == "*2222"]
+    assert list(second_card["total_spent"]) == [40.0]
+
+
+def test_monthly_card_deltas_gap_counts_as_zero():
+    operations = pd.DataFrame(
+        {
+            "Дата операции": ["01.01.2021 10:00:00", "01.03.2021 10:00:00"],
+            "Номер карты": ["*1111", "*1111"],
+            "Сумма платежа": [-10.0, -30.0],
+            "Сумма операции с округлением": [10.0, 30.0],
+        }
+    )
+    deltas = analytics.monthly_card_deltas(operations)
+    assert deltas["delta"][1] == 30.0
+
+
+@pytest.fixture
+def history():
+    rng = np.random.default_rng(0)
+    size = 200
+    return pd.DataFrame(
+        {
+            "Категория": rng.choice(["Супермаркеты", "Фастфуд"], size),
+            "Номер карты": rng.choice(["*1111", "*2222", None], size),
+            "Сумма платежа": -rng.uniform(100, 200, size),
+        }
+    )
+
+
+def test_anomaly_detector_bulk_matches_per_record(history):
+    bulk = analytics.AnomalyDetector()
+    first = bulk.score_table(history.iloc[:120])
+    second = bulk.score_table(history.iloc[120:])
+
+    single = analytics.AnomalyDetector()
+    scores = [single.score(row) for row in history.to_dict(orient="records")]
+    expected = np.array([np.nan if z is None else z for z in scores])
+
+    np.testing.assert_allclose(np.concatenate([first, second]), expected)
+    for key, state in single.state.items():
+        np.testing.assert_allclose(bulk.state[key], state)
+
+
+def test_anomaly_detector_flags_outlier(history, tmp_path):
+    state_path = str(tmp_path / "state.json")
+    assert analytics.detect_anomalies(history, state_path).empty
+
+    detector = analytics.AnomalyDetector.load(state_path)
+    usual = detector.score(
+        {"Категория": "Супермаркеты", "Номер карты": "*1111", "Сумма платежа": -150.0}
+    )
+    unusual = detector.score(
+        {"Категория": "Супермаркеты", "Номер карты": "*1111", "Сумма платежа": -1500.0}
+    )
+    assert not detector.is_anomaly(usual)
+    assert detector.is_anomaly(unusual)
+    assert detector.score({"Категория": "Пополнения", "Сумма платежа": 500.0}) is None
+
+
+def test_anomaly_detector_flags_spike_after_constant_history():
+    constant = pd.DataFrame(
+        {
+            "Категория": ["Такси"] * 11,
+            "Номер карты": ["*3333"] * 11,
+            "Сумма платежа": [-100.0] * 10 + [-10000.0],
+        }
+    )
+    bulk = analytics.AnomalyDetector()
+    scores = bulk.score_table(constant)
+    assert np.all(scores[5:10] == 0.0)
+    assert bulk.is_anomaly(scores[-1])
+
+    single = analytics.AnomalyDetector()
+    records = constant.to_dict(orient="records")
+    scores = [single.score(row) for row in records]
+    assert scores[5:10] == [0.0] * 5
+    assert single.is_anomaly(scores[-1])
+
+
+def test_detect_anomalies_uses_caller_threshold(history, tmp_path):
+    state_path = str(tmp_path / "state.json")
+    analytics.detect_anomalies(history, state_path, threshold=3.0)
+    charge = pd.DataFrame(
+        {"Категория": ["Фастфуд"], "Номер карты": ["*1111"], "Сумма платежа": [-5000.0]}
+    )
+    assert analytics.detect_anomalies(charge, state_path, threshold=100.0).empty
+    assert len(analytics.detect_anomalies(charge, state_path, threshold=3.0)) == 1
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -2,11 +2,16 @@ import json
 import os
 import tempfile
 import unittest
+from unittest import mock
 
 import pandas as pd
 
 import reports
-from src.reports import expenses_by_category
+from src.reports import (
+    expenses_by_category,
+    export_report,
+    rolling_expenses_by_category,
+)
 
 
 class TestExpensesByCategory(unittest.TestCase):
@@ -74,5 +79,150 @@ class TestExpensesByCategory(unittest.TestCase):
         os.remove(output_file)
 
 
+class TestRollingExpensesByCategory(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.excel_path = os.path.join(self.temp_dir.name, "operations.xlsx")
+
+        data = {
+            "Дата операции": [
+                "01.12.2021 12:35:05",
+                "02.12.2021 14:41:17",
+                "03.12.2021 17:14:21",
+                "05.12.2021 10:00:00",
+            ],
+            "Категория": ["Фастфуд", "Связь", "Фастфуд", "Фастфуд"],
+            "Сумма платежа": [99, 15, 80, 10],
+        }
+        pd.DataFrame(data).to_excel(self.excel_path, index=False)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_rolling_window_totals(self):
+        result = rolling_expenses_by_category(
+            self.excel_path, None, "2021-11-30", "2021-12-05", window_days=3
+        )
+        data = json.loads(result)
+        self.assertEqual(data["window_days"], 3)
+        fastfood = [item["total_spent"] for item in data["series"]["Фастфуд"]]
+        self.assertEqual(fastfood, [99, 179, 80, 90, 10, 10])
+        connection = [item["total_spent"] for item in data["series"]["Связь"]]
+        self.assertEqual(connection, [15, 15, 15, 0, 0, 0])
+        self.assertEqual(data["series"]["Связь"][0]["start_date"], "2021-11-30")
+        partial = [item["partial"] for item in data["series"]["Связь"]]
+        self.assertEqual(partial, [False] * 4 + [True] * 2)
+
+    def test_rolling_window_single_category(self):
+        result = rolling_expenses_by_category(self.excel_path, "Связь", window_days=3)
+        data = json.loads(result)
+        self.assertEqual(list(data["series"]), ["Связь"])
+        totals = [item["total_spent"] for item in data["series"]["Связь"]]
+        self.assertEqual(totals, [15, 15, 0])
+
+    def test_rolling_window_default_end_has_full_windows(self):
+        days = pd.date_range("2021-01-01", periods=120)
+        pd.DataFrame(
+            {
+                "Дата операции": days.strftime("%d.%m.%Y 12:00:00"),
+                "Категория": ["Фастфуд"] * len(days),
+                "Сумма платежа": [-1] * len(days),
+            }
+        ).to_excel(self.excel_path, index=False)
+        result = rolling_expenses_by_category(self.excel_path, None, window_days=90)
+        series = json.loads(result)["series"]["Фастфуд"]
+        self.assertEqual(len(series), 31)
+        self.assertEqual(series[-1]["start_date"], "2021-01-31")
+        self.assertTrue(all(item["total_spent"] == -90.0 for item in series))
+        self.assertFalse(any(item["partial"] for item in series))
+
+    def test_rolling_window_shorter_data_than_window(self):
+        result = rolling_expenses_by_category(self.excel_path, None, window_days=90)
+        self.assertIn("error", json.loads(result))
+
+    def test_rolling_window_invalid_length(self):
+        result = rolling_expenses_by_category(self.excel_path, None, window_days=0)
+        self.assertIn("error", json.loads(result))
+
+    def test_rolling_window_invalid_date(self):
+        result = rolling_expenses_by_category(self.excel_path, None, "01-12-2021")
+        self.assertIn("error", json.loads(result))
+
+
+class TestExportReport(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.rows = [
+            {"Категория": "Фастфуд", "Сумма платежа": 99.0, "Кэшбэк": float("nan")},
+            {"Категория": "Связь", "Сумма платежа": 15.0, "Кэшбэк": 1.0},
+        ]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_export_to_excel(self):
+        path = os.path.join(self.temp_dir.name, "report.xlsx")
+        count = export_report(json.dumps({"results": self.rows}), path)
+        self.assertEqual(count, 3)
+        df = pd.read_excel(path)
+        self.assertEqual(list(df.columns), ["Категория", "Сумма платежа", "Кэшбэк"])
+        self.assertEqual(list(df["Сумма платежа"]), [99.0, 15.0])
+        self.assertTrue(pd.isna(df["Кэшбэк"][0]))
+
+    def test_export_dataframe_to_csv(self):
+        path = os.path.join(self.temp_dir.name, "report.csv")
+        count = export_report(pd.DataFrame(self.rows), path)
+        self.assertEqual(count, 3)
+        df = pd.read_csv(path, sep=";", encoding="utf-8-sig")
+        self.assertEqual(list(df["Категория"]), ["Фастфуд", "Связь"])
+
+    def test_export_rolling_series(self):
+        path = os.path.join(self.temp_dir.name, "rolling.xlsx")
+        points = [
+            {"start_date": f"2021-01-{day:02d}", "total_spent": -1.0, "partial": False}
+            for day in range(1, 31)
+        ]
+        result = {"window_days": 90, "series": {"Фастфуд": points, "Связь": points}}
+        count = export_report(json.dumps(result), path)
+        self.assertEqual(count, 61)
+        df = pd.read_excel(path)
+        self.assertEqual(
+            list(df.columns), ["category", "start_date", "total_spent", "partial"]
+        )
+        self.assertEqual(list(df["category"].unique()), ["Фастфуд", "Связь"])
+
+    def test_export_rejects_oversized_cell_in_excel(self):
+        path = os.path.join(self.temp_dir.name, "report.xlsx")
+        count = export_report({"data": list(range(10000))}, path)
+        self.assertEqual(count, 0)
+        self.assertFalse(os.path.exists(path))
+
+    def test_export_keeps_large_cell_in_csv(self):
+        path = os.path.join(self.temp_dir.name, "report.csv")
+        count = export_report({"data": list(range(10000))}, path)
+        self.assertEqual(count, 2)
+        df = pd.read_csv(path, sep=";", encoding="utf-8-sig")
+        self.assertEqual(len(json.loads(df["data"][0])), 10000)
+
+    def test_export_splits_rows_across_sheets(self):
+        path = os.path.join(self.temp_dir.name, "report.xlsx")
+        rows = [{"n": number} for number in range(7)]
+        with mock.patch("src.reports.EXCEL_MAX_ROWS", 3):
+            count = export_report(rows, path)
+        self.assertEqual(count, 8)
+        sheets = pd.read_excel(path, sheet_name=None)
+        self.assertEqual(list(sheets), ["Отчет", "Отчет 2", "Отчет 3", "Отчет 4"])
+        self.assertEqual(list(sheets["Отчет 2"]["n"]), [2, 3])
+        self.assertEqual(list(sheets["Отчет 4"]["n"]), [6])
+
+    def test_export_error_result(self):
+        path = os.path.join(self.temp_dir.name, "report.xlsx")
+        count = export_report(json.dumps({"error": "Нет данных"}), path)
+        self.assertEqual(count, 0)
+        self.assertFalse(os.path.exists(path))
+
+
 if __name__ == "__main__":
     unittest.main()
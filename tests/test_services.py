@@ -45,5 +45,230 @@ def test_search_in_data_invalid_file():
     assert "error" in data
 
 
+def test_search_in_data_regex():
+    result = services.search_in_data("колхоз|магнит", FILE_PATH, regex=True)
+    data = json.loads(result)
+    assert data["results_count"] > 0
+    for row in data["results"]:
+        assert "колхоз" in row["Описание"].lower() or "магнит" in row["Описание"].lower()
+
+
+def test_search_in_data_regex_limit():
+    result = services.search_in_data("^Колхоз$", FILE_PATH, regex=True, limit=3)
+    data = json.loads(result)
+    assert data["results_count"] == 3
+
+
+def test_search_in_data_invalid_regex():
+    result = services.search_in_data("(колхоз", FILE_PATH, regex=True)
+    data = json.loads(result)
+    assert "error" in data
+
+
+def test_regex_search_positions_parallel_matches_serial(monkeypatch):
+    data = pd.DataFrame(
+        {
+            "Описание": ["Колхоз", "Магнит", "Такси", "колхозный рынок"] * 50,
+            "Сумма платежа": [-1.0] * 200,
+        }
+    )
+    monkeypatch.setattr(services, "REGEX_SHARD_SIZE", 30)
+    serial = services.regex_search_positions(data, "колхоз", workers=1)
+    parallel = services.regex_search_positions(data, "колхоз", workers=2)
+    assert serial == parallel
+    assert list(serial[:4]) == [0, 3, 4, 7]
+    limited = services.regex_search_positions(data, "колхоз", limit=5, workers=2)
+    assert list(limited) == list(serial[:5])
+
+
+def test_fuzzy_match_tolerates_typo():
+    index = services.build_merchant_index(["Колхоз", "Магнит", "Пятёрочка", None])
+    matches = services.fuzzy_match(index, "Колхос")
+    assert matches[0][0] == "Колхоз"
+    assert services.fuzzy_match(index, "пятерочка")[0] == ("Пятёрочка", 1.0)
+    assert services.fuzzy_match(index, "Такси") == []
+
+
+def test_fuzzy_match_transliteration():
+    index = services.build_merchant_index(["Колхоз", "Магнит", "Пятёрочка"])
+    assert services.fuzzy_match(index, "Kolhoz")[0] == ("Колхоз", 1.0)
+    assert services.fuzzy_match(index, "Kolkhoz")[0] == ("Колхоз", 1.0)
+    assert services.fuzzy_match(index, "Magnet")[0][0] == "Магнит"
+    assert services.fuzzy_match(index, "Pyaterochka")[0] == ("Пятёрочка", 1.0)
+
+
+def test_search_in_data_fuzzy():
+    result = services.search_in_data("Колхос", FILE_PATH, fuzzy=True)
+    data = json.loads(result)
+    assert data["matches"][0]["description"] == "Колхоз"
+    assert data["results_count"] > 0
+    descriptions = {match["description"] for match in data["matches"]}
+    assert all(row["Описание"] in descriptions for row in data["results"])
+
+
+def test_query_data_combined_filters():
+    result = services.query_data(
+        FILE_PATH,
+        text="колхоз",
+        date_from="2021-12-01",
+        date_to="2021-12-31",
+        categories=["Супермаркеты"],
+        amount_max=0,
+        columns=["Дата операции", "Сумма платежа", "Описание"],
+    )
+    data = json.loads(result)
+    assert data["results_count"] > 0
+    for row in data["results"]:
+        assert set(row) == {"Дата операции", "Сумма платежа", "Описание"}
+        assert "колхоз" in row["Описание"].lower()
+        assert row["Дата операции"].endswith("12.2021", 0, 10)
+        assert row["Сумма платежа"] <= 0
+
+
+def test_query_data_card_filter():
+    result = services.query_data(FILE_PATH, card="*7197", columns=["Номер карты"])
+    data = json.loads(result)
+    assert data["results_count"] > 0
+    assert all(row["Номер карты"] == "*7197" for row in data["results"])
+
+
+def test_query_data_single_category_string():
+    as_string = json.loads(
+        services.query_data(FILE_PATH, categories="Супермаркеты", columns=["Категория"])
+    )
+    as_list = json.loads(
+        services.query_data(FILE_PATH, categories=["Супермаркеты"], columns=["Категория"])
+    )
+    assert as_string["results_count"] == as_list["results_count"] > 0
+
+
+def test_query_data_non_date_value_error():
+    result = services.query_data(FILE_PATH, amount_min="много")
+    data = json.loads(result)
+    assert "error" in data
+    assert "YYYY-MM-DD" not in data["error"]
+
+
+def test_query_data_unknown_column():
+    result = services.query_data(FILE_PATH, columns=["Нет такого"])
+    data = json.loads(result)
+    assert "error" in data
+
+
+def test_query_data_invalid_date():
+    result = services.query_data(FILE_PATH, date_from="01-12-2021")
+    data = json.loads(result)
+    assert "error" in data
+
+
+def _export(path, dates, amounts):
+    pd.DataFrame(
+        {
+            "Дата операции": dates,
+            "Номер карты": ["*7197"] * len(dates),
+            "Сумма платежа": amounts,
+            "Описание": ["Колхоз"] * len(dates),
+        }
+    ).to_excel(path, index=False)
+
+
+def test_merge_operations_drops_overlap(tmp_path):
+    first = str(tmp_path / "first.xlsx")
+    second = str(tmp_path / "second.xlsx")
+    target = str(tmp_path / "all.xlsx")
+    _export(
+        first,
+        ["30.11.2021 10:00:00", "01.12.2021 10:00:00", "01.12.2021 10:00:00"],
+        [-10.0, -20.0, -20.0],
+    )
+    _export(
+        second,
+        ["01.12.2021 10:00:00", "01.12.2021 10:00:00", "02.12.2021 10:00:00"],
+        [-20.0, -20.0, -30.0],
+    )
+
+    data = json.loads(services.merge_operations(first, target))
+    assert data["added_count"] == 3
+    assert data["dropped_count"] == 0
+
+    data = json.loads(services.merge_operations(second, target))
+    assert data["added_count"] == 1
+    assert data["dropped_count"] == 2
+    assert list(pd.read_excel(target)["Сумма платежа"]) == [-10.0, -20.0, -20.0, -30.0]
+
+    data = json.loads(services.merge_operations(second, target))
+    assert data["added_count"] == 0
+    assert data["dropped_count"] == 3
+
+
+def test_operation_fingerprints_ignore_dtypes():
+    first = pd.DataFrame(
+        {
+            "Дата операции": ["01.12.2021 10:00:00", "02.12.2021 11:00:00"],
+            "Номер карты": ["*7197", "*7197"],
+            "Сумма платежа": [-20, -30],
+            "MCC": [5411, 5812],
+            "Описание": ["Колхоз", "Магнит "],
+        }
+    )
+    second = pd.DataFrame(
+        {
+            "Дата операции": pd.to_datetime(
+                ["2021-12-01 10:00:00", "2021-12-02 11:00:00"]
+            ),
+            "Номер карты": ["*7197", "*7197"],
+            "Сумма платежа": [-20.0, -30.0],
+            "MCC": [5411.0, 5812.0],
+            "Описание": ["Колхоз", "Магнит"],
+        }
+    )
+    assert list(services.operation_fingerprints(first)) == list(
+        services.operation_fingerprints(second)
+    )
+
+
+def test_merge_operations_mcc_dtype_differs(tmp_path):
+    first = str(tmp_path / "first.xlsx")
+    second = str(tmp_path / "second.xlsx")
+    target = str(tmp_path / "all.xlsx")
+    rows = {
+        "Дата операции": ["01.12.2021 10:00:00", "02.12.2021 10:00:00"],
+        "Номер карты": ["*7197", "*7197"],
+        "Сумма платежа": [-20.0, -30.0],
+        "MCC": [5411, 5812],
+        "Описание": ["Колхоз", "Магнит"],
+    }
+    pd.DataFrame(rows).to_excel(first, index=False)
+    with_blank = pd.DataFrame(rows)
+    with_blank.loc[2] = ["03.12.2021 10:00:00", "*7197", 500.0, None, "Пополнение"]
+    with_blank.to_excel(second, index=False)
+    assert pd.read_excel(first)["MCC"].dtype != pd.read_excel(second)["MCC"].dtype
+
+    services.merge_operations(first, target)
+    data = json.loads(services.merge_operations(second, target))
+    assert data["added_count"] == 1
+    assert data["dropped_count"] == 2
+
+    os.remove(target + ".fingerprints.npy")
+    data = json.loads(services.merge_operations(second, target))
+    assert data["added_count"] == 0
+    assert data["dropped_count"] == 3
+
+
+def test_merge_operations_bootstraps_from_target(tmp_path):
+    target = str(tmp_path / "all.xlsx")
+    new = str(tmp_path / "new.xlsx")
+    _export(target, ["01.12.2021 10:00:00"], [-20.0])
+    _export(new, ["01.12.2021 10:00:00", "02.12.2021 10:00:00"], [-20.0, -30.0])
+    data = json.loads(services.merge_operations(new, target))
+    assert data["added_count"] == 1
+    assert data["dropped"][0]["Сумма платежа"] == -20.0
+
+
+def test_merge_operations_invalid_file(tmp_path):
+    result = services.merge_operations("missing.xlsx", str(tmp_path / "all.xlsx"))
+    assert "error" in json.loads(result)
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from src import storage
+
+
+def test_upsert_and_get_latest():
+    storage.upsert_quotes(
+        [
+            ("AAPL", "2025-04-01", 170.0),
+            ("AAPL", "2025-04-02", 172.5),
+            ("USDEUR", "2025-04-02", 0.9),
+        ]
+    )
+    storage.upsert_quotes([("AAPL", "2025-04-02", 173.0)])
+    latest = storage.get_latest(["AAPL", "USDEUR", "GOOG"])
+    assert latest == {"AAPL": 173.0, "USDEUR": 0.9}
+
+
+def test_get_latest_respects_max_age():
+    storage.upsert_quotes([("AAPL", "2025-04-01", 170.0)])
+    assert storage.get_latest(["AAPL"], max_age=3600) == {"AAPL": 170.0}
+    assert storage.get_latest(["AAPL"], max_age=-1) == {}
+
+
+def test_get_history():
+    storage.upsert_quotes(
+        [("USDEUR", f"2025-04-0{day}", 0.9 + day / 100) for day in range(1, 6)]
+    )
+    history = storage.get_history("USDEUR", "2025-04-02", "2025-04-04")
+    assert [date for date, _ in history] == ["2025-04-02", "2025-04-03", "2025-04-04"]
+
+
+def test_unavailable_database_is_cache_miss(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "db_path", str(tmp_path / "missing" / "q.sqlite3"))
+    assert storage.upsert_quotes([("AAPL", "2025-04-01", 170.0)]) == 0
+    assert storage.get_latest(["AAPL"]) == {}
+    assert storage.get_history("AAPL") == []
+
+
+def test_start_background_refresh():
+    called = threading.Event()
+    stop = storage.start_background_refresh(called.set, interval=60)
+    try:
+        assert called.wait(5)
+    finally:
+        stop.set()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -1,9 +1,12 @@
+import json
 import os
+from unittest import mock
 
 import pandas as pd
 import pytest
 
 import src.utils as utils
+from src import storage
 
 
 def test_calculate_date_range_valid():
@@ -56,6 +59,22 @@ def test_fetch_currency_and_stocks():
     assert isinstance(stocks, list)
 
 
+@mock.patch("src.utils.requests.get")
+def test_fetch_currency_and_stocks_without_cache(mock_get, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "db_path", str(tmp_path / "missing" / "q.sqlite3"))
+    mock_get.return_value.json.side_effect = [
+        {"quotes": {"USDRUB": 73.456}},
+        {"data": [{"symbol": "AAPL", "close": 170.0, "date": "2025-04-01T00:00:00"}]},
+    ]
+    settings_path = tmp_path / "settings.json"
+    settings_path.write_text(
+        json.dumps({"user_currencies": ["USD"], "user_stocks": ["AAPL"]})
+    )
+    currencies, stocks = utils.fetch_currency_and_stocks(str(settings_path))
+    assert currencies == [{"currency": "USD", "rate": 73.46}]
+    assert stocks == [{"stock": "AAPL", "price": 170.0}]
+
+
 def test_sort_transactions_by_month():
     if not utils.operations_data:
         pytest.skip("Файл operations.xlsx отсутствует или пустой")
@@ -64,5 +83,79 @@ def test_sort_transactions_by_month():
     assert filtered_df is not None
 
 
+def test_convert_amounts_uses_rate_on_date():
+    transactions = pd.DataFrame(
+        {
+            "Дата операции": [
+                "05.01.2021 10:00:00",
+                "01.01.2021 09:00:00",
+                "03.01.2021 12:00:00",
+                "31.12.2020 23:00:00",
+            ],
+            "Сумма платежа": [-200.0, -100.0, -300.0, -50.0],
+        }
+    )
+    rates = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2021-01-01", "2021-01-03", "2021-01-01"]),
+            "currency": ["USD", "USD", "EUR"],
+            "rate": [100.0, 50.0, 200.0],
+        }
+    )
+    result = utils.convert_amounts(transactions, rates)
+    assert list(result["Сумма платежа USD"][:3]) == [-4.0, -1.0, -6.0]
+    assert list(result["Сумма платежа EUR"][:3]) == [-1.0, -0.5, -1.5]
+    assert pd.isna(result["Сумма платежа USD"][3])
+
+
+def test_convert_amounts_accepts_parsed_dates():
+    transactions = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2021-01-05 10:00:00", "2021-01-01 09:00:00"]),
+            "Сумма платежа": [-200.0, -100.0],
+        }
+    )
+    rates = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2021-01-01", "2021-01-03"]),
+            "currency": ["USD", "USD"],
+            "rate": [100.0, 50.0],
+        }
+    )
+    result = utils.convert_amounts(transactions, rates, ["USD"], date_column="date")
+    assert list(result["Сумма платежа USD"]) == [-4.0, -1.0]
+
+
+def test_convert_amounts_non_rub_payment():
+    transactions = pd.DataFrame(
+        {
+            "Дата операции": ["02.01.2021 10:00:00", "02.01.2021 11:00:00"],
+            "Сумма платежа": [-100.0, -50.0],
+            "Валюта платежа": ["CNY", "KZT"],
+        }
+    )
+    rates = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2021-01-01", "2021-01-01"]),
+            "currency": ["USD", "CNY"],
+            "rate": [75.0, 11.25],
+        }
+    )
+    result = utils.convert_amounts(transactions, rates, ["USD"])
+    assert result["Сумма платежа USD"][0] == -15.0
+    assert pd.isna(result["Сумма платежа USD"][1])
+
+
+@mock.patch("src.utils.requests.get")
+def test_fetch_historical_rates_uses_quotes_store(mock_get):
+    mock_get.return_value.json.return_value = {
+        "quotes": {"2021-01-01": {"USDRUB": 73.0}, "2021-01-02": {"USDRUB": 74.0}}
+    }
+    utils.fetch_historical_rates(["USD"], "2021-01-01", "2021-01-02")
+    assert storage.get_history("USDRUB") == [("2021-01-01", 73.0), ("2021-01-02", 74.0)]
+    rates = utils.load_rates_table(["USD"], "2021-01-02")
+    assert list(rates["rate"]) == [74.0]
+    assert list(rates["date"]) == [pd.Timestamp("2021-01-02")]
+
 if __name__ == "__main__":
     pytest.main()
@@ -1,13 +1,16 @@
 import json
 import os
 import tempfile
+import time
 from datetime import datetime
 from unittest import mock
 
 import pandas as pd
 import pytest
 
+import src.utils as utils
 import src.views as views
+from src import storage
 
 
 @pytest.fixture
@@ -69,6 +72,25 @@ def test_get_exchange_rates_failure(mock_get):
     assert result == []
 
 
+@mock.patch("views.requests.get")
+def test_get_exchange_rates_cached(mock_get):
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = {"rates": {"EUR": 0.9, "RUB": 90}}
+    views.get_exchange_rates(["EUR", "RUB"])
+    result = views.get_cached_exchange_rates(["EUR", "RUB"])
+    assert result == [{"currency": "EUR", "rate": 100.0}, {"currency": "RUB", "rate": 1.0}]
+    assert views.get_cached_exchange_rates(["EUR", "USD"]) == []
+
+
+@mock.patch("views.requests.get")
+def test_get_exchange_rates_without_cache(mock_get, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "db_path", str(tmp_path / "missing" / "q.sqlite3"))
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.return_value = {"rates": {"EUR": 0.9, "RUB": 90}}
+    assert views.get_cached_exchange_rates(["EUR"]) == []
+    assert views.get_exchange_rates(["EUR"]) == [{"currency": "EUR", "rate": 100.0}]
+
+
 @mock.patch("views.requests.get")
 def test_retrieve_stock_data(mock_get):
     mock_get.return_value.status_code = 200
@@ -88,6 +110,59 @@ def test_analyze_transactions_success(temp_transactions_file):
 
 
 
+@pytest.fixture
+def temp_operations_file():
+    data = {
+        "Дата операции": [
+            "30.03.2025 10:00:00",
+            "01.04.2025 10:00:00",
+            "01.04.2025 12:00:00",
+            "03.04.2025 09:00:00",
+            "03.04.2025 18:00:00",
+        ],
+        "Номер карты": ["*1234", "*1234", "*5678", "*1234", "*5678"],
+        "Сумма платежа": [-50.0, -100.0, -300.0, -200.0, -10.0],
+        "Кэшбэк": [1.0, 1.0, None, 2.0, None],
+        "Категория": ["Еда", "Еда", "Транспорт", "Еда", "Кино"],
+        "Описание": ["Кафе", "Кафе", "Такси", "Ресторан", "Кино"],
+    }
+    tmp_dir = tempfile.mkdtemp()
+    file_path = os.path.join(tmp_dir, "operations.xlsx")
+    pd.DataFrame(data).to_excel(file_path, index=False)
+    yield file_path
+    os.remove(file_path)
+
+
+def test_precompute_dashboards(temp_operations_file, tmp_path):
+    output_file = str(tmp_path / "dashboards.ndjson")
+    written = views.precompute_dashboards(
+        temp_operations_file, "2025-03-31", "2025-04-03", output_file, top_n=2
+    )
+    assert written == 4
+    with open(output_file, encoding="utf-8") as file:
+        days = {line["date"]: line for line in map(json.loads, file)}
+
+    assert days["2025-03-31"]["cards"] == [
+        {"card_ending": "1234", "total_expense": -50.0, "cashback_earned": 1.0}
+    ]
+    assert days["2025-04-02"]["cards"] == [
+        {"card_ending": "1234", "total_expense": -100.0, "cashback_earned": 1.0},
+        {"card_ending": "5678", "total_expense": -300.0, "cashback_earned": 0.0},
+    ]
+    last = days["2025-04-03"]
+    assert last["cards"][0]["total_expense"] == -300.0
+    assert last["cards"][1]["total_expense"] == -310.0
+    assert [t["amount"] for t in last["top_transactions"]] == [-10.0, -100.0]
+
+
+def test_precompute_dashboards_file_not_found(tmp_path):
+    output_file = str(tmp_path / "dashboards.ndjson")
+    written = views.precompute_dashboards(
+        "missing.xlsx", "2025-04-01", "2025-04-30", output_file
+    )
+    assert written == 0
+
+
 def test_analyze_transactions_file_not_found():
     result = views.analyze_transactions("missing.xlsx", "2025-04-01", "2025-04-30")
     assert result == {"card_summary": [], "top_five_transactions": []}
@@ -119,6 +194,47 @@ def test_main_dashboard_handler_success(
     assert data["status"] == "success"
 
 
+def _quotes_api_response(url):
+    response = mock.Mock()
+    if "currencylayer" in url:
+        response.json.return_value = {"quotes": {"EURRUB": 90.5, "USDRUB": 80.25}}
+    else:
+        response.json.return_value = {
+            "data": [
+                {"symbol": "AAPL", "close": 170.0, "date": "2025-04-01T00:00:00"},
+                {"symbol": "GOOG", "close": 150.0, "date": "2025-04-01T00:00:00"},
+            ]
+        }
+    return response
+
+
+def test_main_dashboard_handler_reads_refreshed_quotes():
+    settings_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "user_settings.json"
+    )
+    with mock.patch("requests.get", side_effect=_quotes_api_response):
+        stop = utils.start_quotes_refresher(settings_path, interval=60)
+        try:
+            for _ in range(50):
+                if len(storage.get_latest(["EURRUB", "USDRUB", "AAPL", "GOOG"])) == 4:
+                    break
+                time.sleep(0.1)
+        finally:
+            stop.set()
+
+    with mock.patch("requests.get") as mock_get:
+        result = json.loads(views.main_dashboard_handler("2021-12-31 14:30:00"))
+    mock_get.assert_not_called()
+    assert result["data"]["exchange_rates"] == [
+        {"currency": "EUR", "rate": 90.5},
+        {"currency": "USD", "rate": 80.25},
+    ]
+    assert result["data"]["stock_info"] == [
+        {"stock": "AAPL", "price": 170.0},
+        {"stock": "GOOG", "price": 150.0},
+    ]
+
+
 def test_main_dashboard_handler_failure():
     result = views.main_dashboard_handler("invalid-date")
     data = json.loads(result)